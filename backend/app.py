@@ -8,16 +8,26 @@
 import os
 import sys
 import glob
+import gzip
+import hashlib
+import io
+import json
+import queue
+import threading
 
-# 启动时清理代理环境变量
-for var in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'ALL_PROXY', 'all_proxy', 'REQUESTS_TIMEOUT', 'CURL_CA_BUNDLE']:
-    if var in os.environ:
-        del os.environ[var]
-
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-import json
-from openai import OpenAI
+
+from rooms import RoomError, RoomManager, format_event
+
+# brotli为可选依赖，未安装时只提供gzip压缩
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 需要在启动时清理的代理相关环境变量
+PROXY_ENV_VARS = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'ALL_PROXY', 'all_proxy', 'REQUESTS_TIMEOUT', 'CURL_CA_BUNDLE']
 
 # 初始化Flask
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
@@ -25,9 +35,24 @@ CORS(app)
 
 # 全局变量
 config = {}
+config_mtime = None
 case_data = {}
 game_state = {}
 
+# 单次LLM请求的超时时间（秒），同时也是房间内等待合并调用结果的上限
+LLM_TIMEOUT = 60
+
+# SSE心跳间隔（秒）
+ROOM_KEEPALIVE = 15
+
+# 同时打开的SSE事件流上限：每个事件流占用一个线程，
+# gunicorn.conf.py 按该值加上普通请求的线程数来设置线程池大小
+ROOM_MAX_STREAMS = int(os.environ.get('GAME_MAX_STREAMS', '96'))
+room_stream_slots = threading.BoundedSemaphore(ROOM_MAX_STREAMS)
+
+# 案例缓存: 案例文件路径 -> {"mtime", "data", "payload"}
+case_cache = {}
+
 # 调试开关
 DEBUG = True
 
@@ -36,31 +61,135 @@ def log(msg):
     if DEBUG:
         print(f"[DEBUG] {msg}", file=sys.stderr)
 
+def clear_proxy_env():
+    """清理代理环境变量（由启动入口调用，导入模块时不再修改环境）"""
+    for var in PROXY_ENV_VARS:
+        if var in os.environ:
+            del os.environ[var]
+
 def load_config():
-    """加载配置文件"""
-    global config
+    """加载配置文件，文件未修改时直接使用已加载（或预加载）的配置"""
+    global config, config_mtime
     try:
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         config_path = os.path.join(project_root, 'config.json')
+        mtime = os.path.getmtime(config_path)
+        if config and mtime == config_mtime:
+            return config
         log(f"加载配置文件: {config_path}")
         with open(config_path, 'r', encoding='utf-8') as f:
             config = json.load(f)
+        config_mtime = mtime
         log(f"配置加载成功: API={config.get('openai_api_base', 'N/A')[:50]}...")
         return config
     except Exception as e:
         log(f"加载配置失败: {e}")
         raise
 
+def read_case_file(case_file):
+    """读取案例文件，文件未修改时直接返回缓存的数据"""
+    mtime = os.path.getmtime(case_file)
+    entry = case_cache.get(case_file)
+    if entry is None or entry['mtime'] != mtime:
+        log(f"读取案例文件: {case_file}")
+        with open(case_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entry = {"mtime": mtime, "data": data, "payload": None}
+        case_cache[case_file] = entry
+    return entry['data']
+
+def gzip_bytes(data):
+    """gzip压缩，固定mtime保证相同内容得到相同字节（兼容Python 3.7）"""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9, mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+def build_case_payload(case):
+    """预先序列化并压缩案例数据，计算ETag"""
+    body = json.dumps({
+        "success": True,
+        "case": {
+            "title": case['title'],
+            "background": case['background'],
+            "characters": case['characters'],
+            "default_player_role": case['player_role'],
+            "context": case.get('context', '')
+        },
+        "initial_dialogue": case['initial_dialogue'],
+        "max_rounds": config['max_rounds']
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(body).hexdigest()[:32]
+
+    # 每种编码对应一个独立的强ETag
+    variants = {"identity": (body, digest)}
+    gz = gzip_bytes(body)
+    if len(gz) < len(body):
+        variants['gzip'] = (gz, f"{digest}-gzip")
+    if brotli is not None:
+        br = brotli.compress(body, quality=11)
+        if len(br) < len(body):
+            variants['br'] = (br, f"{digest}-br")
+    return {"max_rounds": config['max_rounds'], "variants": variants}
+
+def get_case_payload(case_file):
+    """获取案例的预计算响应，案例文件或max_rounds变化时重新生成"""
+    case = read_case_file(case_file)
+    entry = case_cache[case_file]
+    payload = entry['payload']
+    if payload is None or payload['max_rounds'] != config['max_rounds']:
+        payload = build_case_payload(case)
+        entry['payload'] = payload
+    return payload
+
+def case_response(payload, conditional=True):
+    """
+    按Accept-Encoding返回预压缩的案例数据。
+    conditional 为 True 时（GET请求）带上ETag，所选编码的ETag未变化时返回304；
+    POST请求传 False，始终返回200和完整内容。
+    """
+    variants = payload['variants']
+    for encoding in ('br', 'gzip', 'identity'):
+        if encoding in variants and (encoding == 'identity' or request.accept_encodings[encoding]):
+            break
+    body, etag = variants[encoding]
+
+    if conditional and request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype='application/json')
+        if encoding != 'identity':
+            resp.headers['Content-Encoding'] = encoding
+    if conditional:
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'no-cache'
+    resp.vary.add('Accept-Encoding')
+    return resp
+
+def get_case_path(case_filename=None):
+    """返回案例文件的绝对路径，未指定时使用配置中的案例"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if case_filename is None:
+        return os.path.join(project_root, config.get('case_file', 'cases/example_case.json'))
+    return os.path.join(project_root, 'cases', case_filename)
+
+def resolve_case_file(case_filename):
+    """校验案例文件名，只允许 cases/ 目录下已存在的 .json 文件"""
+    if (not case_filename or os.path.basename(case_filename) != case_filename
+            or not case_filename.endswith('.json')):
+        raise ValueError(f"无效的案例文件名: {case_filename}")
+    case_file = get_case_path(case_filename)
+    if not os.path.isfile(case_file):
+        raise FileNotFoundError(f"案例不存在: {case_filename}")
+    return case_file
+
 def load_case():
-    """加载案例数据"""
+    """加载配置中的案例，文件未修改时直接使用缓存，并预先生成案例的响应数据"""
     global case_data
     try:
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        case_file_relative = config.get('case_file', 'cases/example_case.json')
-        case_file = os.path.join(project_root, case_file_relative)
-        log(f"加载案例文件: {case_file}")
-        with open(case_file, 'r', encoding='utf-8') as f:
-            case_data = json.load(f)
+        case_file = get_case_path()
+        case_data = read_case_file(case_file)
+        get_case_payload(case_file)
         log(f"案例加载成功: {case_data.get('title', 'N/A')}")
         return case_data
     except Exception as e:
@@ -68,8 +197,10 @@ def load_case():
         raise
 
 def init_openai_client():
-    """初始化OpenAI客户端"""
+    """初始化OpenAI客户端（首次调用LLM时才导入OpenAI SDK，降低冷启动开销）"""
     try:
+        from openai import OpenAI
+
         api_key = config.get('openai_api_key', '')
         api_base = config.get('openai_api_base', '')
         log(f"初始化OpenAI客户端: base={api_base[:50]}...")
@@ -81,23 +212,27 @@ def init_openai_client():
         log(f"初始化OpenAI客户端失败: {e}")
         raise
 
-def generate_system_prompt():
-    """生成系统提示词"""
+def describe_case(case):
+    """案例背景、角色和情境描述，供系统提示词使用"""
     characters_desc = "\n".join([
         f"- {char['name']}（{char['role']}）：{char['personality']}，所属{char['team']}"
-        for char in case_data['characters']
+        for char in case['characters']
     ])
 
-    return f"""你是一个团队冲突模拟器的AI助手。你需要根据以下背景信息来模拟团队成员之间的对话。
-
-案例背景：
-{case_data['background']}
+    return f"""案例背景：
+{case['background']}
 
 角色信息：
 {characters_desc}
 
 当前情境：
-{case_data.get('context', '')}
+{case.get('context', '')}"""
+
+def generate_system_prompt():
+    """生成系统提示词"""
+    return f"""你是一个团队冲突模拟器的AI助手。你需要根据以下背景信息来模拟团队成员之间的对话。
+
+{describe_case(case_data)}
 
 玩家扮演的角色是：{case_data['player_role']}
 
@@ -119,21 +254,34 @@ def generate_system_prompt():
 - end_summary: 如果游戏结束，提供整体总结和反思
 """
 
+def format_history(dialogue):
+    """把对话列表拼成提示词中的文本"""
+    return "\n".join([
+        f"{msg['speaker']}: {msg['content']}"
+        for msg in dialogue
+    ])
+
+def request_llm_json(system_prompt, user_prompt):
+    """调用LLM并解析JSON回复，单次请求最长等待LLM_TIMEOUT秒"""
+    client = init_openai_client()
+    response = client.chat.completions.create(
+        model=config.get('model', 'gpt-4'),
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=config.get('temperature', 0.8),
+        response_format={"type": "json_object"},
+        timeout=LLM_TIMEOUT
+    )
+    return json.loads(response.choices[0].message.content)
+
 def generate_options(dialogue_history):
     """生成对话选项"""
     log(f"generate_options: 对话历史={len(dialogue_history)}条")
-    
-    try:
-        client = init_openai_client()
-    except Exception as e:
-        log(f"初始化OpenAI客户端失败: {e}")
-        raise Exception(f"初始化AI客户端失败: {e}")
 
     # 构建对话历史
-    history_text = "\n".join([
-        f"{msg['speaker']}: {msg['content']}"
-        for msg in dialogue_history
-    ])
+    history_text = format_history(dialogue_history)
     log(f"构建对话历史完成，共{len(history_text)}字符")
 
     user_prompt = f"""当前对话历史：
@@ -150,18 +298,8 @@ def generate_options(dialogue_history):
 
     try:
         log(f"调用AI API，模型={config.get('model', 'N/A')}")
-        response = client.chat.completions.create(
-            model=config.get('model', 'gpt-4'),
-            messages=[
-                {"role": "system", "content": generate_system_prompt()},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=config.get('temperature', 0.8),
-            response_format={"type": "json_object"}
-        )
+        result = request_llm_json(generate_system_prompt(), user_prompt)
         log("AI API调用成功")
-        
-        result = json.loads(response.choices[0].message.content)
         log(f"解析结果: {len(result.get('options', []))}个选项")
         return result
     except Exception as e:
@@ -170,12 +308,7 @@ def generate_options(dialogue_history):
 
 def generate_npc_response(player_choice, dialogue_history):
     """生成NPC回应"""
-    client = init_openai_client()
-
-    history_text = "\n".join([
-        f"{msg['speaker']}: {msg['content']}"
-        for msg in dialogue_history
-    ])
+    history_text = format_history(dialogue_history)
 
     user_prompt = f"""对话历史：
 {history_text}
@@ -199,22 +332,156 @@ def generate_npc_response(player_choice, dialogue_history):
 - end_summary: 如果结束，提供总结和反思
 """
 
-    response = client.chat.completions.create(
-        model=config['model'],
-        messages=[
-            {"role": "system", "content": generate_system_prompt()},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=config['temperature'],
-        response_format={"type": "json_object"}
-    )
+    return request_llm_json(generate_system_prompt(), user_prompt)
 
-    return json.loads(response.choices[0].message.content)
+def generate_room_system_prompt(context):
+    """生成多人房间的系统提示词"""
+    return f"""你是一个团队冲突模拟器的AI助手。多名玩家在同一场对话中分别扮演不同角色，你需要扮演其余角色，并为玩家提供回复选项。
+
+{describe_case(context['case'])}
+
+玩家扮演的角色是：{'、'.join(context['human_characters'])}
+由你扮演的角色是：{'、'.join(context['npc_characters']) or '无'}
+
+游戏规则：
+1. 游戏最多进行{context['max_rounds']}轮对话
+2. 为每个玩家角色分别提供4个可选的回复选项（A、B、C、D），反映不同的沟通策略和情绪强度
+3. 选项可以包含@符号来通知其他成员
+4. 所有玩家发言后，只为由你扮演的角色生成回应，绝不替玩家角色发言
+5. 要考虑每个角色的性格特点和团队背景
+6. 对话可以包含真实的情绪（包括激烈的争吵），但要保持专业性
+7. 当接近最大轮数时，要引导对话走向结束
+
+请始终以JSON对象格式回复：
+- 生成选项时：{{"options": {{"玩家角色名": [{{"label": "A", "content": "对话内容"}}, ...]}}}}，options 必须包含每个玩家角色
+- 生成回应时：{{"npc_responses": [{{"speaker": "角色名", "content": "对话内容"}}], "round_summary": "本轮总结", "is_end": false, "end_summary": "结束时的总结和反思"}}
+"""
+
+def check_room_options(result, humans):
+    """校验选项格式，格式不对时抛出异常，避免把错误结果缓存到本轮"""
+    options = result.get('options') if isinstance(result, dict) else None
+    if not isinstance(options, dict):
+        raise ValueError("AI返回的选项格式错误")
+    for name in humans:
+        if not isinstance(options.get(name), list) or not options[name]:
+            raise ValueError(f"AI未返回角色{name}的选项")
+    return result
+
+def check_room_npc_result(result):
+    """校验NPC回应格式"""
+    if not isinstance(result, dict):
+        raise ValueError("AI返回的回应格式错误")
+    responses = result.get('npc_responses', [])
+    if not isinstance(responses, list) or not all(
+            isinstance(msg, dict) and isinstance(msg.get('speaker'), str) and isinstance(msg.get('content'), str)
+            for msg in responses):
+        raise ValueError("AI返回的NPC回应格式错误")
+    if not isinstance(result.get('is_end', False), bool):
+        raise ValueError("AI返回的is_end不是布尔值")
+    for key in ('round_summary', 'end_summary'):
+        if not isinstance(result.get(key, ''), str):
+            raise ValueError(f"AI返回的{key}不是字符串")
+    return result
+
+def generate_room_options(context):
+    """为房间内所有玩家角色一次性生成本轮选项"""
+    humans = context['human_characters']
+    log(f"generate_room_options: 第{context['current_round']}轮，玩家角色={humans}")
+
+    history_text = format_history(context['dialogue'])
+
+    user_prompt = f"""当前对话历史：
+{history_text}
+
+本局由多名玩家分别扮演：{'、'.join(humans)}。
+请为每个玩家角色分别生成4个可选的回复选项。这些选项应该：
+1. 反映不同的沟通策略（如：合作、防御、质疑、建设性等）
+2. 有不同的情绪强度
+3. 符合该角色的性格特点
+4. 可以直接复制到聊天软件中使用
+
+当前是第{context['current_round']}轮，最多{context['max_rounds']}轮。
+
+请返回JSON格式，包含：
+- options: 对象，键为玩家角色名，值为4个选项的数组，每个选项包含label（A/B/C/D）和content（对话内容）
+"""
+
+    result = request_llm_json(generate_room_system_prompt(context), user_prompt)
+    return check_room_options(result, humans)
+
+def generate_room_npc_responses(context):
+    """本轮所有玩家发言后，一次性生成未被认领角色的回应"""
+    humans = context['human_characters']
+    npcs = context['npc_characters']
+    log(f"generate_room_npc_responses: 第{context['current_round']}轮，NPC={npcs}")
+
+    history_text = format_history(context['dialogue'])
+    round_text = format_history(context['round_messages'])
+
+    user_prompt = f"""对话历史：
+{history_text}
+
+本轮玩家（{'、'.join(humans)}）的发言：
+{round_text}
+
+请只模拟以下角色对此的反应：{'、'.join(npcs)}。不要替玩家角色发言。要考虑：
+1. 每个角色的性格特点
+2. 当前的对话氛围
+3. 团队的实际情况
+4. 真实的人际互动
+
+当前是第{context['current_round'] + 1}轮，最多{context['max_rounds']}轮。
+如果接近最大轮数，要考虑如何自然地结束对话。
+
+请返回JSON格式，包含：
+- npc_responses: NPC回应的数组，每个包含speaker和content
+- round_summary: 本轮总结
+- is_end: 是否结束游戏
+- end_summary: 如果结束，提供总结和反思
+"""
+
+    result = request_llm_json(generate_room_system_prompt(context), user_prompt)
+    return check_room_npc_result(result)
+
+def run_room_turn(room):
+    """生成NPC回应并推送给房间内所有人，所有角色都被认领时不调用LLM"""
+    try:
+        context = room.prompt_context()
+        if context['npc_characters']:
+            result = generate_room_npc_responses(context)
+        else:
+            result = {}
+    except Exception as e:
+        log(f"房间{room.id}生成NPC回应失败: {type(e).__name__}: {e}")
+        room.fail_turn(f"生成NPC回应失败: {str(e)[:300]}")
+        return
+    room.finish_turn(result)
+
+def start_room_turn(room):
+    """在后台线程中结束本轮，请求立即返回，结果通过事件推送"""
+    threading.Thread(target=run_room_turn, args=(room,), daemon=True).start()
+
+# 多人房间
+room_manager = RoomManager(on_turn_ready=start_room_turn)
 
 @app.route('/')
 def index():
     """返回前端页面"""
-    return send_from_directory(app.static_folder, 'index.html')
+    # 页面内联了未带版本号的脚本，每次都通过ETag/Last-Modified重新验证，避免发布后运行旧代码
+    resp = send_from_directory(app.static_folder, 'index.html')
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """就绪检查：配置和案例数据已加载时返回200"""
+    if not config or not case_data:
+        return jsonify({"success": False, "ready": False}), 503
+    return jsonify({
+        "success": True,
+        "ready": True,
+        "case": case_data.get('title', '')
+    })
 
 @app.route('/api/init', methods=['GET'])
 def init_game():
@@ -224,23 +491,7 @@ def init_game():
     load_config()
     load_case()
 
-    # 获取可选的玩家角色列表
-    characters = case_data['characters']
-
-    return jsonify({
-        "success": True,
-        "case": {
-            "title": case_data['title'],
-            "background": case_data['background'],
-            "characters": characters,
-            "default_player_role": case_data['player_role'],
-            "context": case_data.get('context', '')
-        },
-        "initial_dialogue": case_data['initial_dialogue'],
-        "max_rounds": config['max_rounds']
-    })
-
-import glob
+    return case_response(get_case_payload(get_case_path()))
 
 @app.route('/api/cases', methods=['GET'])
 def list_cases():
@@ -251,16 +502,15 @@ def list_cases():
         
         cases = []
         for filepath in glob.glob(os.path.join(cases_dir, '*.json')):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                case = json.load(f)
-                filename = os.path.basename(filepath)
-                cases.append({
-                    'id': filename.replace('.json', ''),
-                    'title': case.get('title', filename),
-                    'description': case.get('background', '')[:100] + '...' if len(case.get('background', '')) > 100 else case.get('background', ''),
-                    'characters_count': len(case.get('characters', [])),
-                    'filename': filename
-                })
+            case = read_case_file(filepath)
+            filename = os.path.basename(filepath)
+            cases.append({
+                'id': filename.replace('.json', ''),
+                'title': case.get('title', filename),
+                'description': case.get('background', '')[:100] + '...' if len(case.get('background', '')) > 100 else case.get('background', ''),
+                'characters_count': len(case.get('characters', [])),
+                'filename': filename
+            })
         
         return jsonify({
             "success": True,
@@ -274,6 +524,24 @@ def list_cases():
         }), 500
 
 
+@app.route('/api/cases/<case_filename>', methods=['GET'])
+def get_case(case_filename):
+    """获取案例数据（可被浏览器缓存，通过If-None-Match重新验证）"""
+    try:
+        case_file = resolve_case_file(case_filename)
+        load_config()
+        return case_response(get_case_payload(case_file))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except Exception as e:
+        log(f"加载案例失败: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route('/api/select_case', methods=['POST'])
 def select_case():
     """选择案例并加载"""
@@ -286,26 +554,14 @@ def select_case():
         return jsonify({"success": False, "error": "未指定案例"}), 400
     
     try:
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        case_file = os.path.join(project_root, 'cases', case_filename)
-        
-        with open(case_file, 'r', encoding='utf-8') as f:
-            case_data = json.load(f)
+        case_file = resolve_case_file(case_filename)
+        case_data = read_case_file(case_file)
         
         load_config()
         
-        return jsonify({
-            "success": True,
-            "case": {
-                "title": case_data['title'],
-                "background": case_data['background'],
-                "characters": case_data['characters'],
-                "default_player_role": case_data['player_role'],
-                "context": case_data.get('context', '')
-            },
-            "initial_dialogue": case_data['initial_dialogue'],
-            "max_rounds": config['max_rounds']
-        })
+        return case_response(get_case_payload(case_file), conditional=False)
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         log(f"加载案例失败: {e}")
         return jsonify({
@@ -316,11 +572,18 @@ def select_case():
 
 @app.route('/api/start', methods=['POST'])
 def start_game():
-    """开始游戏，指定玩家角色"""
+    """开始游戏，指定玩家角色，可选指定案例"""
     global game_state, case_data
 
     data = request.json
     player_role = data.get('player_role')
+    case_filename = data.get('case_filename')
+
+    if case_filename:
+        try:
+            case_data = read_case_file(resolve_case_file(case_filename))
+        except (ValueError, FileNotFoundError) as e:
+            return jsonify({"success": False, "error": str(e)}), 400
 
     # 验证角色是否有效
     valid_roles = [char['name'] for char in case_data['characters']]
@@ -435,5 +698,153 @@ def get_history():
         "max_rounds": game_state['max_rounds']
     })
 
+@app.errorhandler(RoomError)
+def handle_room_error(e):
+    """房间操作错误"""
+    return jsonify({"success": False, "error": str(e)}), e.status
+
+@app.route('/api/rooms', methods=['POST'])
+def create_room():
+    """创建多人房间，可选指定案例"""
+    data = request.get_json(silent=True) or {}
+    case_filename = data.get('case_filename')
+
+    try:
+        load_config()
+        case_file = resolve_case_file(case_filename) if case_filename else get_case_path()
+        case = read_case_file(case_file)
+        room = room_manager.create(case, config['max_rounds'])
+    except RoomError:
+        raise
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        log(f"创建房间失败: {type(e).__name__}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    log(f"创建房间: {room.id} ({case.get('title', 'N/A')})")
+    return jsonify({"success": True, "room": room.snapshot()})
+
+@app.route('/api/rooms/<room_id>', methods=['GET'])
+def get_room(room_id):
+    """获取房间状态"""
+    return jsonify({"success": True, "room": room_manager.get(room_id).snapshot()})
+
+@app.route('/api/rooms/<room_id>/join', methods=['POST'])
+def join_room(room_id):
+    """认领角色加入房间"""
+    room = room_manager.get(room_id)
+    data = request.json
+    participant_id = room.join(data.get('character'))
+    return jsonify({"success": True, "participant_id": participant_id, "room": room.snapshot()})
+
+@app.route('/api/rooms/<room_id>/leave', methods=['POST'])
+def leave_room(room_id):
+    """释放角色离开房间"""
+    room = room_manager.get(room_id)
+    data = request.json
+    if room.leave(data.get('participant_id')):
+        start_room_turn(room)
+    return jsonify({"success": True})
+
+@app.route('/api/rooms/<room_id>/options', methods=['POST'])
+def get_room_options(room_id):
+    """获取本轮选项，同一轮所有玩家共享一次LLM调用"""
+    room = room_manager.get(room_id)
+    data = request.json
+    try:
+        options = room.options_for(data.get('participant_id'), generate_room_options, timeout=LLM_TIMEOUT)
+    except RoomError:
+        raise
+    except TimeoutError:
+        log(f"房间{room_id}等待选项超时")
+        return jsonify({
+            "success": False,
+            "error": "生成选项超时，请稍后重试"
+        }), 504
+    except Exception as e:
+        log(f"房间{room_id}生成选项失败: {type(e).__name__}: {e}")
+        return jsonify({
+            "success": False,
+            "error": f"生成选项失败: {str(e)[:300]}"
+        }), 500
+    return jsonify({"success": True, "options": options})
+
+@app.route('/api/rooms/<room_id>/say', methods=['POST'])
+def room_say(room_id):
+    """玩家发言，所有玩家都发言后由LLM生成其余角色的回应"""
+    room = room_manager.get(room_id)
+    data = request.json
+    content = data.get('content')
+    if not content:
+        return jsonify({"success": False, "error": "未提供发言内容"}), 400
+
+    if room.say(data.get('participant_id'), content):
+        start_room_turn(room)
+    return jsonify({"success": True})
+
+@app.route('/api/rooms/<room_id>/retry', methods=['POST'])
+def retry_room_turn(room_id):
+    """NPC回应生成失败后重试"""
+    room = room_manager.get(room_id)
+    started = room.retry()
+    if started:
+        start_room_turn(room)
+    return jsonify({"success": True, "started": started})
+
+@app.route('/api/rooms/<room_id>/events', methods=['GET'])
+def room_events(room_id):
+    """
+    房间事件流（SSE），连接后先推送一次完整状态。
+    玩家需带上 participant_id 保持连接，断开超过一定时间后角色会被释放；
+    不带 participant_id 时作为旁观者订阅。
+    """
+    room = room_manager.get(room_id)
+    participant_id = request.args.get('participant_id')
+
+    if not room_stream_slots.acquire(blocking=False):
+        return jsonify({"success": False, "error": "连接数已达上限，请稍后再试"}), 503
+    try:
+        if participant_id:
+            room.attach_stream(participant_id)
+    except RoomError:
+        room_stream_slots.release()
+        raise
+
+    q = room.bus.subscribe()
+    snapshot = room.snapshot()
+
+    def stream():
+        yield format_event('snapshot', snapshot)
+        while True:
+            try:
+                message = q.get(timeout=ROOM_KEEPALIVE)
+            except queue.Empty:
+                # 借心跳的时机回收空闲玩家和过期房间
+                room_manager.sweep()
+                if not room.bus.is_subscribed(q):
+                    break
+                message = ": keepalive\n\n"
+            if message is None:
+                break
+            yield message
+
+    def cleanup():
+        room.bus.unsubscribe(q)
+        if participant_id:
+            room.detach_stream(participant_id)
+        room_stream_slots.release()
+
+    resp = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # 由WSGI服务器在连接结束时调用，客户端在第一条消息前断开也能释放资源
+    resp.call_on_close(cleanup)
+    return resp
+
 if __name__ == '__main__':
+    clear_proxy_env()
+    load_config()
+    load_case()
     app.run(host='0.0.0.0', port=5000, debug=True)
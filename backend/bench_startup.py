@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准测试
+
+分别测量：
+- 导入 app 模块的耗时
+- 导入 wsgi 入口（含预加载配置和案例）的耗时
+- 首次请求 /api/ready 和 /api/init 的延迟
+并检查启动过程中没有导入 OpenAI SDK。
+
+每次测量都在新的子进程中进行，保证是冷启动。
+
+用法:
+    python3 bench_startup.py [--runs N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 在子进程中执行的测量脚本
+PROBE = r'''
+import json
+import sys
+import time
+
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+import wsgi
+t2 = time.perf_counter()
+
+client = wsgi.app.test_client()
+t3 = time.perf_counter()
+ready_status = client.get('/api/ready').status_code
+t4 = time.perf_counter()
+init_status = client.get('/api/init').status_code
+t5 = time.perf_counter()
+
+print(json.dumps({
+    "import_app_ms": (t1 - t0) * 1000,
+    "import_wsgi_ms": (t2 - t1) * 1000,
+    "first_ready_ms": (t4 - t3) * 1000,
+    "first_init_ms": (t5 - t4) * 1000,
+    "ready_status": ready_status,
+    "init_status": init_status,
+    "openai_imported": "openai" in sys.modules,
+}))
+'''
+
+def run_once():
+    """在新进程中运行一次测量"""
+    env = dict(os.environ)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    out = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='测量后端冷启动耗时')
+    parser.add_argument('--runs', type=int, default=5, help='测量次数')
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+
+    print(f"运行次数: {args.runs}")
+    for key in ['import_app_ms', 'import_wsgi_ms', 'first_ready_ms', 'first_init_ms']:
+        values = [r[key] for r in results]
+        print(f"{key:16s} 中位数={statistics.median(values):8.2f}  最小={min(values):8.2f}  最大={max(values):8.2f}")
+
+    last = results[-1]
+    print(f"/api/ready 状态码: {last['ready_status']}")
+    print(f"/api/init 状态码: {last['init_status']}")
+    print(f"启动期间导入了OpenAI SDK: {last['openai_imported']}")
+
+    if last['openai_imported']:
+        print("错误: OpenAI SDK 应在首次调用LLM时才导入", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
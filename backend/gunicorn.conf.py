@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 配置文件
+
+preload_app 让 wsgi.py 在 master 进程中加载一次配置和案例，
+worker（包括重启后的 worker）启动时无需再读取文件。
+
+单人游戏状态（app.py 中的 game_state）和多人房间都保存在进程内存中，
+因此只能使用一个 worker；多个 worker 时请求会落到没有该状态的进程上。
+并发通过 gthread 的线程数来扩展。
+
+每个打开的SSE事件流占用一个线程，直到连接关闭。
+线程池 = GAME_MAX_STREAMS（事件流上限，app.py 超出时返回503）
+       + GAME_REQUEST_THREADS（留给普通请求的线程），
+保证事件流占满时 /api/init、/say、/options 等请求仍有线程可用。
+"""
+
+import os
+
+bind = os.environ.get('GAME_BIND', '0.0.0.0:5000')
+workers = 1
+worker_class = 'gthread'
+threads = int(os.environ.get('GAME_MAX_STREAMS', '96')) + int(os.environ.get('GAME_REQUEST_THREADS', '32'))
+preload_app = True
+timeout = 120
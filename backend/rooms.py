@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+团队矛盾冲突模拟器 - 多人房间
+
+多名玩家在同一个案例中分别扮演不同角色：
+- 每个房间共享一份对话历史
+- 每名玩家认领一个角色，未被认领的角色由LLM扮演
+- 房间内的所有更新通过事件总线推送给订阅者（SSE），客户端无需轮询
+- 每轮的LLM调用在房间内合并：无论有多少玩家，每轮只生成一次选项和一次NPC回应
+- 玩家断开事件流超过一定时间后自动释放角色；空房间和已结束的房间会被回收
+
+房间保存在进程内存中，同一房间的所有请求需要落在同一个进程上。
+"""
+
+import json
+import queue
+import threading
+import time
+import uuid
+
+
+class RoomError(Exception):
+    """房间操作失败，status 为对应的HTTP状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def format_event(event, data):
+    """序列化为SSE消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class EventBus:
+    """房间事件总线：每个事件只序列化一次，然后分发给所有订阅者"""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.max_pending)
+        with self.lock:
+            self.subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.discard(q)
+
+    def is_subscribed(self, q):
+        with self.lock:
+            return q in self.subscribers
+
+    def count(self):
+        with self.lock:
+            return len(self.subscribers)
+
+    def publish(self, event, data):
+        message = format_event(event, data)
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # 客户端消费过慢，断开它，避免积压
+                self.unsubscribe(q)
+
+    def close(self):
+        """断开所有订阅者，队列中放入None通知事件流结束"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.subscribers.clear()
+        for q in subscribers:
+            try:
+                q.put_nowait(None)
+            except queue.Full:
+                pass
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Coalescer:
+    """相同key的并发调用只执行一次，其余调用者等待并共享结果"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def run(self, key, fn, timeout=None):
+        """timeout 为等待其他调用者结果的最长秒数，超时抛出 TimeoutError"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+                # 失败的调用不缓存，允许重试
+                with self.lock:
+                    self.calls.pop(key, None)
+            finally:
+                call.done.set()
+        elif not call.done.wait(timeout):
+            raise TimeoutError("等待合并调用结果超时")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class Room:
+    """一个共享对话的多人房间"""
+
+    def __init__(self, room_id, case, max_rounds, clock=time.monotonic):
+        for key in ('title', 'characters', 'initial_dialogue'):
+            if key not in case:
+                raise RoomError(f"案例数据缺少字段: {key}", 500)
+
+        self.id = room_id
+        self.case = case
+        self.max_rounds = max_rounds
+        self.clock = clock
+        self.dialogue = list(case['initial_dialogue'])
+        self.round_start = len(self.dialogue)
+        self.current_round = 0
+        self.participants = {}  # participant_id -> 角色名
+        self.streams = {}  # participant_id -> 打开的事件流数量
+        self.last_seen = {}  # participant_id -> 最后一次请求或事件流断开的时间
+        self.spoken = set()  # 本轮已发言的玩家角色
+        self.generating = False
+        self.is_end = False
+        self.end_summary = ''
+        self.last_activity = clock()
+        self.lock = threading.Lock()
+        self.bus = EventBus()
+        self.option_calls = Coalescer()
+
+    def _characters(self):
+        return [char['name'] for char in self.case['characters']]
+
+    def _claimed(self):
+        return sorted(set(self.participants.values()))
+
+    def _npc_characters(self):
+        claimed = set(self.participants.values())
+        return [name for name in self._characters() if name not in claimed]
+
+    def _touch(self, participant_id=None):
+        now = self.clock()
+        self.last_activity = now
+        if participant_id is not None:
+            self.last_seen[participant_id] = now
+
+    def _character(self, participant_id):
+        character = self.participants.get(participant_id)
+        if character is None:
+            raise RoomError("未加入房间", 403)
+        self._touch(participant_id)
+        return character
+
+    def _check_open(self):
+        if self.is_end:
+            raise RoomError("游戏已结束", 409)
+        if self.generating:
+            raise RoomError("正在等待其他角色回应", 409)
+
+    def _turn_ready(self):
+        """所有玩家角色都已发言时，本轮可以交给LLM"""
+        claimed = set(self.participants.values())
+        return (not self.generating and not self.is_end
+                and bool(claimed) and claimed <= self.spoken)
+
+    def _close_turn_if_ready(self):
+        if not self._turn_ready():
+            return False
+        self.generating = True
+        self.bus.publish('generating', {"current_round": self.current_round})
+        return True
+
+    def _release(self, participant_id):
+        character = self.participants.pop(participant_id)
+        self.streams.pop(participant_id, None)
+        self.last_seen.pop(participant_id, None)
+        self.spoken.discard(character)
+        self._touch()
+        self.bus.publish('left', {"character": character, "claimed": self._claimed()})
+
+    def snapshot(self):
+        """房间当前状态（不包含玩家ID）"""
+        with self.lock:
+            return {
+                "room_id": self.id,
+                "title": self.case['title'],
+                "characters": self.case['characters'],
+                "claimed": self._claimed(),
+                "npc_characters": self._npc_characters(),
+                "spoken": sorted(self.spoken),
+                "dialogue": list(self.dialogue),
+                "current_round": self.current_round,
+                "max_rounds": self.max_rounds,
+                "generating": self.generating,
+                "is_end": self.is_end,
+                "end_summary": self.end_summary
+            }
+
+    def prompt_context(self):
+        """生成提示词所需的数据副本"""
+        with self.lock:
+            return {
+                "case": self.case,
+                "max_rounds": self.max_rounds,
+                "current_round": self.current_round,
+                "dialogue": list(self.dialogue),
+                "round_messages": self.dialogue[self.round_start:],
+                "human_characters": self._claimed(),
+                "npc_characters": self._npc_characters()
+            }
+
+    def join(self, character):
+        """认领角色，返回participant_id"""
+        with self.lock:
+            if self.is_end:
+                raise RoomError("游戏已结束", 409)
+            if character not in self._characters():
+                raise RoomError("无效的角色")
+            if character in self.participants.values():
+                raise RoomError("该角色已被其他玩家认领", 409)
+            participant_id = uuid.uuid4().hex
+            self.participants[participant_id] = character
+            self.streams[participant_id] = 0
+            self._touch(participant_id)
+            self.bus.publish('joined', {"character": character, "claimed": self._claimed()})
+            return participant_id
+
+    def leave(self, participant_id):
+        """释放角色，返回本轮是否因此可以交给LLM"""
+        with self.lock:
+            self._character(participant_id)
+            self._release(participant_id)
+            return self._close_turn_if_ready()
+
+    def attach_stream(self, participant_id):
+        """玩家打开事件流，事件流保持期间角色不会被释放"""
+        with self.lock:
+            self._character(participant_id)
+            self.streams[participant_id] += 1
+
+    def detach_stream(self, participant_id):
+        """玩家的事件流断开，从此刻开始计算空闲时间"""
+        with self.lock:
+            if participant_id in self.participants:
+                self.streams[participant_id] -= 1
+                self._touch(participant_id)
+
+    def release_idle(self, timeout):
+        """释放没有事件流且空闲超过timeout秒的玩家，返回本轮是否因此可以交给LLM"""
+        with self.lock:
+            now = self.clock()
+            idle = [
+                pid for pid in self.participants
+                if self.streams[pid] == 0 and now - self.last_seen[pid] > timeout
+            ]
+            for pid in idle:
+                self._release(pid)
+            return self._close_turn_if_ready()
+
+    def is_expired(self, timeout):
+        """没有玩家或游戏已结束，且超过timeout秒没有活动"""
+        with self.lock:
+            return ((not self.participants or self.is_end)
+                    and not self.generating
+                    and self.clock() - self.last_activity > timeout)
+
+    def close(self):
+        """回收房间，断开所有事件流"""
+        self.bus.close()
+
+    def say(self, participant_id, content):
+        """玩家发言，返回本轮是否已可以交给LLM"""
+        with self.lock:
+            character = self._character(participant_id)
+            self._check_open()
+            if character in self.spoken:
+                raise RoomError("本轮已发言，请等待其他玩家", 409)
+            message = {"speaker": character, "content": content}
+            self.dialogue.append(message)
+            self.spoken.add(character)
+            self.bus.publish('message', message)
+            return self._close_turn_if_ready()
+
+    def retry(self):
+        """上一次生成失败后重新触发本轮，返回是否需要生成"""
+        with self.lock:
+            return self._close_turn_if_ready()
+
+    def options_for(self, participant_id, generate, timeout=None):
+        """
+        获取玩家本轮的选项。
+        同一轮所有玩家共享一次生成，generate(context) 需返回 {"options": {角色名: [...]}}，
+        格式不对时应抛出异常，失败的生成不会被缓存。
+        等待其他玩家发起的生成超过timeout秒时抛出 TimeoutError。
+        """
+        with self.lock:
+            character = self._character(participant_id)
+            self._check_open()
+            key = (self.current_round, tuple(self._claimed()))
+            calls = self.option_calls
+        context = self.prompt_context()
+        result = calls.run(key, lambda: generate(context), timeout=timeout)
+        return result['options'].get(character, [])
+
+    def finish_turn(self, result):
+        """写入NPC回应并进入下一轮"""
+        with self.lock:
+            npcs = set(self._npc_characters())
+            # 只接受未被认领角色的发言
+            responses = [
+                msg for msg in result.get('npc_responses', [])
+                if msg.get('speaker') in npcs
+            ]
+            self.dialogue.extend(responses)
+            self.current_round += 1
+            self.round_start = len(self.dialogue)
+            self.spoken.clear()
+            self.generating = False
+            self.option_calls = Coalescer()
+            self.is_end = result.get('is_end') is True or self.current_round >= self.max_rounds
+            self.end_summary = result.get('end_summary', '')
+            self._touch()
+            self.bus.publish('turn', {
+                "npc_responses": responses,
+                "round_summary": result.get('round_summary', ''),
+                "is_end": self.is_end,
+                "end_summary": self.end_summary,
+                "current_round": self.current_round,
+                "max_rounds": self.max_rounds
+            })
+
+    def fail_turn(self, error):
+        """生成失败，保持本轮状态，等待重试"""
+        with self.lock:
+            self.generating = False
+            self._touch()
+            self.bus.publish('error', {"error": error})
+
+
+class RoomManager:
+    """
+    进程内的房间表
+
+    - claim_timeout: 玩家没有打开事件流且超过该秒数没有请求时，释放其角色
+    - room_timeout: 空房间或已结束的房间超过该秒数没有活动时回收
+    - max_rooms: 房间数量上限
+    - on_turn_ready: 释放角色后本轮可以交给LLM时的回调
+    """
+
+    def __init__(self, max_rooms=200, claim_timeout=120, room_timeout=600,
+                 sweep_interval=5, on_turn_ready=None, clock=time.monotonic):
+        self.max_rooms = max_rooms
+        self.claim_timeout = claim_timeout
+        self.room_timeout = room_timeout
+        self.sweep_interval = sweep_interval
+        self.on_turn_ready = on_turn_ready
+        self.clock = clock
+        self.rooms = {}
+        self.lock = threading.Lock()
+        self.last_sweep = None
+
+    def sweep(self, force=False):
+        """释放空闲玩家、回收过期房间，非强制时最多每sweep_interval秒执行一次"""
+        now = self.clock()
+        with self.lock:
+            if not force and self.last_sweep is not None and now - self.last_sweep < self.sweep_interval:
+                return
+            self.last_sweep = now
+            rooms = list(self.rooms.values())
+
+        for room in rooms:
+            if room.release_idle(self.claim_timeout) and self.on_turn_ready:
+                self.on_turn_ready(room)
+            if room.is_expired(self.room_timeout):
+                with self.lock:
+                    self.rooms.pop(room.id, None)
+                room.close()
+
+    def create(self, case, max_rounds):
+        self.sweep()
+        with self.lock:
+            full = len(self.rooms) >= self.max_rooms
+        if full:
+            self.sweep(force=True)
+        room = Room(uuid.uuid4().hex[:8], case, max_rounds, clock=self.clock)
+        with self.lock:
+            if len(self.rooms) >= self.max_rooms:
+                raise RoomError("房间数量已达上限，请稍后再试", 503)
+            self.rooms[room.id] = room
+        return room
+
+    def get(self, room_id):
+        self.sweep()
+        with self.lock:
+            room = self.rooms.get(room_id)
+        if room is None:
+            raise RoomError("房间不存在", 404)
+        return room
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""测试时把 backend 目录加入导入路径（后端模块以 `import app` 的方式互相导入）"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
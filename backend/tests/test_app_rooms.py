@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""多人房间接口的测试，LLM调用替换为桩函数"""
+
+import threading
+import time
+
+import pytest
+
+import app as backend
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(backend, 'room_manager', backend.RoomManager(on_turn_ready=backend.start_room_turn))
+    return backend.app.test_client()
+
+
+def create_room_with_players(client, *characters):
+    room_id = client.post('/api/rooms', json={}).json['room']['room_id']
+    players = [
+        client.post(f'/api/rooms/{room_id}/join', json={'character': name}).json['participant_id']
+        for name in characters
+    ]
+    return room_id, players
+
+
+def test_create_room_rejects_bad_case_filenames(client):
+    assert client.post('/api/rooms', json={'case_filename': '../config.json'}).status_code == 400
+    assert client.post('/api/rooms', json={'case_filename': 'missing.json'}).status_code == 400
+
+
+def test_create_room_reports_incomplete_case(client, monkeypatch):
+    monkeypatch.setattr(backend, 'read_case_file', lambda path: {"title": "缺字段"})
+    resp = client.post('/api/rooms', json={})
+    assert resp.status_code == 500
+    assert resp.json['success'] is False
+
+
+def test_malformed_options_are_not_cached(client, monkeypatch):
+    replies = [
+        {"options": [{"label": "A", "content": "数组格式"}]},
+        {"options": {"其他": []}},
+        {"options": {"李娜": [{"label": "A", "content": "正确"}]}},
+    ]
+    monkeypatch.setattr(backend, 'request_llm_json', lambda system, user: replies.pop(0))
+    room_id, (player,) = create_room_with_players(client, '李娜')
+
+    url = f'/api/rooms/{room_id}/options'
+    assert client.post(url, json={'participant_id': player}).status_code == 500
+    assert client.post(url, json={'participant_id': player}).status_code == 500
+    resp = client.post(url, json={'participant_id': player})
+    assert resp.status_code == 200
+    assert resp.json['options'][0]['content'] == '正确'
+    assert replies == []
+
+
+@pytest.mark.parametrize('reply', [
+    {"npc_responses": {"王强": "格式错误"}},
+    {"npc_responses": [], "is_end": "false"},
+    {"npc_responses": [], "end_summary": ["不是字符串"]},
+])
+def test_malformed_npc_reply_fails_turn(client, monkeypatch, reply):
+    monkeypatch.setattr(backend, 'request_llm_json', lambda system, user: reply)
+    room_id, (player,) = create_room_with_players(client, '李娜')
+
+    client.post(f'/api/rooms/{room_id}/say', json={'participant_id': player, 'content': '你好'})
+    for _ in range(50):
+        room = client.get(f'/api/rooms/{room_id}').json['room']
+        if not room['generating']:
+            break
+        time.sleep(0.02)
+    assert room['generating'] is False
+    assert room['current_round'] == 0
+
+
+def test_options_wait_times_out(client, monkeypatch):
+    gate = threading.Event()
+
+    def slow(system, user):
+        gate.wait(5)
+        return {"options": {"李娜": [{"label": "A", "content": "慢"}]}}
+
+    monkeypatch.setattr(backend, 'request_llm_json', slow)
+    monkeypatch.setattr(backend, 'LLM_TIMEOUT', 0.05)
+    room_id, (player,) = create_room_with_players(client, '李娜')
+    url = f'/api/rooms/{room_id}/options'
+
+    leader = threading.Thread(target=lambda: client.post(url, json={'participant_id': player}))
+    leader.start()
+    time.sleep(0.05)
+    assert client.post(url, json={'participant_id': player}).status_code == 504
+    gate.set()
+    leader.join()
+
+
+def test_events_stream_holds_claim_until_closed(client):
+    room_id, (player,) = create_room_with_players(client, '李娜')
+    room = backend.room_manager.get(room_id)
+
+    resp = client.get(f'/api/rooms/{room_id}/events?participant_id={player}', buffered=False)
+    assert next(resp.response).startswith(b'event: snapshot')
+    assert room.streams[player] == 1
+    resp.close()
+    assert room.streams[player] == 0
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""预计算案例数据、ETag/304和压缩编码协商的测试"""
+
+import gzip
+import json
+import os
+
+import pytest
+
+import app as backend
+
+CASE_URL = '/api/cases/example_case.json'
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(backend, 'case_cache', {})
+    return backend.app.test_client()
+
+
+def test_negotiates_encoding(client):
+    plain = client.get(CASE_URL)
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    gz = client.get(CASE_URL, headers={'Accept-Encoding': 'gzip'})
+    assert gz.headers['Content-Encoding'] == 'gzip'
+    assert gz.headers['ETag'] != plain.headers['ETag']
+    assert json.loads(gzip.decompress(gz.data)) == plain.json
+
+
+def test_not_modified_for_matching_etag(client):
+    etag = client.get(CASE_URL, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    resp = client.get(CASE_URL, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.headers['ETag'] == etag
+    assert resp.data == b''
+
+
+def test_etag_of_other_encoding_does_not_match(client):
+    gz_etag = client.get(CASE_URL, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    resp = client.get(CASE_URL, headers={'Accept-Encoding': 'identity', 'If-None-Match': gz_etag})
+    assert resp.status_code == 200
+    assert 'Content-Encoding' not in resp.headers
+    assert resp.headers['ETag'] != gz_etag
+
+
+def test_select_case_post_always_returns_body(client):
+    etag = client.get(CASE_URL).headers['ETag']
+    resp = client.post('/api/select_case', json={'case_filename': 'example_case.json'},
+                       headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.json['success'] is True
+    assert 'ETag' not in resp.headers
+
+
+def test_payload_rebuilt_on_mtime_and_max_rounds_change(client, monkeypatch):
+    backend.load_config()
+    case_file = backend.get_case_path('example_case.json')
+    first = backend.get_case_payload(case_file)
+    assert backend.get_case_payload(case_file) is first
+
+    monkeypatch.setitem(backend.config, 'max_rounds', backend.config['max_rounds'] + 1)
+    second = backend.get_case_payload(case_file)
+    assert second is not first
+    assert second['variants']['identity'][1] != first['variants']['identity'][1]
+
+    mtime = os.path.getmtime(case_file)
+    monkeypatch.setattr(backend.os.path, 'getmtime', lambda path: mtime + 1)
+    assert backend.get_case_payload(case_file) is not second
+
+
+def test_resolve_case_file_rejects_paths(client):
+    with pytest.raises(ValueError):
+        backend.resolve_case_file('../config.json')
+    with pytest.raises(ValueError):
+        backend.resolve_case_file('example_case.txt')
+    with pytest.raises(FileNotFoundError):
+        backend.resolve_case_file('missing.json')
+    assert client.get('/api/cases/missing.json').status_code == 404
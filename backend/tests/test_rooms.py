@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""多人房间状态机、合并调用和事件总线的测试（不需要启动服务）"""
+
+import threading
+import time
+
+import pytest
+
+from rooms import Coalescer, EventBus, Room, RoomError, RoomManager
+
+CASE = {
+    "title": "测试案例",
+    "background": "背景",
+    "characters": [
+        {"name": "甲", "role": "前端", "personality": "直接", "team": "前端团队"},
+        {"name": "乙", "role": "后端", "personality": "谨慎", "team": "后端团队"},
+        {"name": "丙", "role": "测试", "personality": "中立", "team": "测试团队"},
+    ],
+    "initial_dialogue": [{"speaker": "丙", "content": "开始"}],
+    "player_role": "乙",
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def drain(q):
+    events = []
+    while not q.empty():
+        events.append(q.get_nowait().split('\n', 1)[0])
+    return events
+
+
+def test_join_say_closes_turn_once_all_players_spoke():
+    room = Room('r1', CASE, 10)
+    events = room.bus.subscribe()
+    p1 = room.join('甲')
+    p2 = room.join('乙')
+
+    assert room.say(p1, '你好') is False
+    with pytest.raises(RoomError):
+        room.say(p1, '再说一次')
+    assert room.say(p2, '收到') is True
+
+    # 生成期间不能再发言
+    with pytest.raises(RoomError) as e:
+        room.say(p2, '插话')
+    assert e.value.status == 409
+
+    context = room.prompt_context()
+    assert context['npc_characters'] == ['丙']
+    assert [m['speaker'] for m in context['round_messages']] == ['甲', '乙']
+
+    room.finish_turn({"npc_responses": [
+        {"speaker": "丙", "content": "好的"},
+        {"speaker": "甲", "content": "冒充玩家"},
+    ]})
+    snapshot = room.snapshot()
+    assert snapshot['current_round'] == 1
+    assert snapshot['spoken'] == []
+    assert snapshot['dialogue'][-1] == {"speaker": "丙", "content": "好的"}
+    assert all(m['content'] != '冒充玩家' for m in snapshot['dialogue'])
+    assert drain(events) == [
+        'event: joined', 'event: joined', 'event: message', 'event: message',
+        'event: generating', 'event: turn',
+    ]
+
+
+def test_join_rejects_claimed_and_unknown_characters():
+    room = Room('r1', CASE, 10)
+    room.join('甲')
+    with pytest.raises(RoomError):
+        room.join('甲')
+    with pytest.raises(RoomError):
+        room.join('丁')
+
+
+def test_room_requires_case_fields():
+    with pytest.raises(RoomError):
+        Room('r1', {"title": "缺字段", "characters": []}, 10)
+
+
+def test_leave_closes_turn():
+    room = Room('r1', CASE, 10)
+    p1 = room.join('甲')
+    p2 = room.join('乙')
+    room.say(p1, '你好')
+
+    assert room.leave(p2) is True
+    assert room.snapshot()['generating'] is True
+
+
+def test_idle_claim_released_without_stream():
+    clock = FakeClock()
+    room = Room('r1', CASE, 10, clock=clock)
+    p1 = room.join('甲')
+    p2 = room.join('乙')
+    room.attach_stream(p1)
+    room.say(p1, '你好')
+
+    clock.now = 100
+    assert room.release_idle(60) is True
+    assert room.snapshot()['claimed'] == ['甲']
+
+    # 打开着事件流的玩家不会被释放
+    clock.now = 1000
+    room.finish_turn({})
+    assert room.release_idle(60) is False
+    assert room.snapshot()['claimed'] == ['甲']
+
+    # 事件流断开后从断开时刻开始计时
+    room.detach_stream(p1)
+    clock.now = 1030
+    room.release_idle(60)
+    assert room.snapshot()['claimed'] == ['甲']
+    clock.now = 1100
+    room.release_idle(60)
+    assert room.snapshot()['claimed'] == []
+    with pytest.raises(RoomError):
+        room.say(p2, '已被释放')
+
+
+def test_manager_expires_empty_rooms_and_limits_count():
+    clock = FakeClock()
+    manager = RoomManager(max_rooms=1, room_timeout=600, claim_timeout=60, clock=clock)
+    room = manager.create(CASE, 10)
+    with pytest.raises(RoomError) as e:
+        manager.create(CASE, 10)
+    assert e.value.status == 503
+
+    events = room.bus.subscribe()
+    clock.now = 601
+    new_room = manager.create(CASE, 10)
+    with pytest.raises(RoomError):
+        manager.get(room.id)
+    assert manager.get(new_room.id) is new_room
+    assert events.get_nowait() is None
+
+
+def test_manager_starts_turn_when_idle_claim_released():
+    clock = FakeClock()
+    ready = []
+    manager = RoomManager(claim_timeout=60, on_turn_ready=ready.append, clock=clock)
+    room = manager.create(CASE, 10)
+    p1 = room.join('甲')
+    room.join('乙')
+    room.attach_stream(p1)
+    room.say(p1, '你好')
+
+    clock.now = 100
+    manager.sweep(force=True)
+    assert ready == [room]
+
+
+def test_options_coalesced_across_players():
+    room = Room('r1', CASE, 10)
+    players = {room.join('甲'): '甲', room.join('乙'): '乙'}
+    calls = []
+    gate = threading.Event()
+
+    def generate(context):
+        calls.append(context['human_characters'])
+        gate.wait(5)
+        return {"options": {"甲": [{"label": "A", "content": "甲选项"}],
+                            "乙": [{"label": "A", "content": "乙选项"}]}}
+
+    results = {}
+
+    def worker(pid, i):
+        results[i] = (players[pid], room.options_for(pid, generate))
+
+    threads = [threading.Thread(target=worker, args=(pid, i))
+               for i, pid in enumerate(list(players) * 4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    for character, options in results.values():
+        assert options[0]['content'] == f'{character}选项'
+
+
+def test_coalescer_shares_result_between_concurrent_callers():
+    calls = Coalescer()
+    count = []
+    gate = threading.Event()
+
+    def fn():
+        count.append(1)
+        gate.wait(5)
+        return 'ok'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(calls.run('k', fn))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert count == [1]
+    assert results == ['ok'] * 8
+
+
+def test_coalescer_does_not_cache_failures():
+    calls = Coalescer()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError('格式错误')
+        return 'ok'
+
+    with pytest.raises(ValueError):
+        calls.run('k', flaky)
+    assert calls.run('k', flaky) == 'ok'
+    assert calls.run('k', flaky) == 'ok'
+    assert len(attempts) == 2
+
+
+def test_coalescer_waiters_time_out():
+    calls = Coalescer()
+    gate = threading.Event()
+    leader = threading.Thread(target=lambda: calls.run('k', lambda: gate.wait(5)))
+    leader.start()
+    time.sleep(0.05)
+
+    with pytest.raises(TimeoutError):
+        calls.run('k', lambda: 'unused', timeout=0.05)
+    gate.set()
+    leader.join()
+    assert calls.run('k', lambda: 'unused', timeout=0.05) is True
+
+
+def test_is_end_must_be_true():
+    room = Room('r1', CASE, 10)
+    p1 = room.join('甲')
+    room.say(p1, '你好')
+    room.finish_turn({"is_end": "false"})
+    assert room.snapshot()['is_end'] is False
+
+
+def test_failed_turn_can_be_retried():
+    room = Room('r1', CASE, 10)
+    p1 = room.join('甲')
+    assert room.say(p1, '你好') is True
+    assert room.retry() is False
+
+    room.fail_turn('生成失败')
+    assert room.snapshot()['generating'] is False
+    assert room.retry() is True
+    room.finish_turn({"npc_responses": [{"speaker": "乙", "content": "好"}]})
+    assert room.snapshot()['current_round'] == 1
+
+
+def test_bus_drops_slow_subscriber():
+    bus = EventBus(max_pending=2)
+    slow = bus.subscribe()
+    fast = bus.subscribe()
+
+    bus.publish('a', {})
+    fast.get_nowait()
+    bus.publish('b', {})
+    fast.get_nowait()
+    bus.publish('c', {})
+
+    assert not bus.is_subscribed(slow)
+    assert bus.is_subscribed(fast)
+    assert fast.get_nowait().startswith('event: c')
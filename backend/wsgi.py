@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+团队矛盾冲突模拟器 - 生产环境入口
+
+用法:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+与 `python3 app.py` 不同，这里不启用 debug/reloader。
+配置和案例数据在 master 进程中加载一次（preload_app），
+fork 出的 worker 直接使用，worker 重启时也无需再读取文件。
+游戏状态保存在进程内存中，因此只运行一个 worker。
+OpenAI SDK 在第一次调用LLM时才会被导入。
+"""
+
+import app as backend
+
+backend.clear_proxy_env()
+backend.load_config()
+backend.load_case()
+
+app = backend.app